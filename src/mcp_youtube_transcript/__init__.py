@@ -5,18 +5,26 @@
 #  This software is released under the MIT License.
 #
 #  http://opensource.org/licenses/mit-license.php
+import asyncio
+import atexit
+import bisect
+import html
+import re
+import threading
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from functools import lru_cache, partial
-from itertools import islice
-from typing import AsyncIterator, Tuple
+from itertools import accumulate
+from operator import attrgetter
+from typing import AsyncIterator, Callable, Hashable, NamedTuple, Tuple, TypeVar
 from typing import Final
-from urllib.parse import urlparse, parse_qs
 
 import humanize
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from mcp import ServerSession
 from mcp.server import FastMCP
 from mcp.server.fastmcp import Context
@@ -30,20 +38,130 @@ from yt_dlp.extractor.youtube import YoutubeIE
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-@dataclass(frozen=True)
-class AppContext:
+_TITLE_RE: Final = re.compile(rb"<title[^>]*>(.*?)</title>", re.I | re.S)
+
+_VIDEO_ID_RE: Final = re.compile(
+    r"^(?:https?://)?"
+    r"(?:(?:[A-Za-z0-9-]+\.)*youtube\.com/watch\?(?:[^&]+&)*v=([A-Za-z0-9_-]{11})|youtu\.be/([A-Za-z0-9_-]{11}))"
+    r"(?=[&#?/]|$)",
+    re.IGNORECASE,
+)
+
+# Same grammar as strptime's "%H%M%S%f".
+_TIME_RE: Final = re.compile(r"(2[0-3]|[0-1]\d|\d)([0-5]\d|\d)(6[0-1]|[0-5]\d|\d)(\d{1,6})")
+
+
+class _Clients(NamedTuple):
     http_client: requests.Session
     ytt_api: YouTubeTranscriptApi
     dlp: YoutubeDL
 
 
+def _new_clients(proxy_config: ProxyConfig | None, adapter: HTTPAdapter) -> _Clients:
+    http_client = requests.Session()
+    http_client.verify = False
+    # Mount before YouTubeTranscriptApi so that the adapter it mounts for proxies takes precedence.
+    http_client.mount("https://", adapter)
+    http_client.mount("http://", adapter)
+    ytt_api = YouTubeTranscriptApi(http_client=http_client, proxy_config=proxy_config)
+
+    dlp = YoutubeDL(params={"quiet": True}, auto_init=False)
+    dlp.add_info_extractor(YoutubeIE())
+
+    atexit.register(http_client.close)
+    atexit.register(dlp.close)
+    return _Clients(http_client=http_client, ytt_api=ytt_api, dlp=dlp)
+
+
+@dataclass(frozen=True)
+class AppContext:
+    """Resources shared by the tools.
+
+    A context is shared by every session of a server, and tools use it from worker threads. Neither
+    ``YouTubeTranscriptApi`` nor ``YoutubeDL`` is thread-safe, so each thread gets its own clients, whose sessions all
+    share the connection pool of ``adapter``. The pool is warmed up in the background, so the warm-up may still be
+    running when the first tool calls use it.
+    """
+
+    proxy_config: ProxyConfig | None
+    adapter: HTTPAdapter
+    _local: threading.local = field(default_factory=threading.local, init=False, compare=False)
+
+    def _clients(self) -> _Clients:
+        clients: _Clients | None = getattr(self._local, "clients", None)
+        if clients is None:
+            clients = self._local.clients = _new_clients(self.proxy_config, self.adapter)
+        return clients
+
+    @property
+    def http_client(self) -> requests.Session:
+        return self._clients().http_client
+
+    @property
+    def ytt_api(self) -> YouTubeTranscriptApi:
+        return self._clients().ytt_api
+
+    @property
+    def dlp(self) -> YoutubeDL:
+        return self._clients().dlp
+
+
+def _warm_up(ctx: AppContext) -> None:
+    # Use the pool directly so that the adapter's retries don't apply.
+    request = requests.Request("HEAD", "https://www.youtube.com/").prepare()
+    proxies: dict[str, str] = {}
+    if ctx.proxy_config is not None:
+        proxy_dict = ctx.proxy_config.to_requests_dict()
+        proxies = {"http": proxy_dict["http"], "https": proxy_dict["https"]}
+    try:
+        conn = ctx.adapter.get_connection_with_tls_context(request, verify=False, proxies=proxies)
+        conn.urlopen(  # type: ignore[attr-defined]
+            "HEAD", ctx.adapter.request_url(request, proxies), retries=False, timeout=5
+        )
+    except (requests.RequestException, urllib3.exceptions.HTTPError):
+        pass
+
+
+def _new_app_context(proxy_config: ProxyConfig | None) -> AppContext:
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=urllib3.Retry(
+            total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False
+        ),
+    )
+    ctx = AppContext(proxy_config=proxy_config, adapter=adapter)
+    threading.Thread(target=_warm_up, args=(ctx,), daemon=True).start()
+    return ctx
+
+
+# Shared by all servers with the same proxy settings; entries are never released.
+_APP_CONTEXTS: Final[dict[Hashable, AppContext]] = {}
+_APP_CONTEXTS_LOCK: Final = threading.Lock()
+
+
+def _proxy_key(proxy_config: ProxyConfig | None) -> Hashable:
+    if proxy_config is None:
+        return None
+    return (
+        type(proxy_config),
+        tuple(sorted(proxy_config.to_requests_dict().items())),
+        proxy_config.prevent_keeping_connections_alive,
+        proxy_config.retries_when_blocked,
+    )
+
+
+def _get_app_context(proxy_config: ProxyConfig | None) -> AppContext:
+    key = _proxy_key(proxy_config)
+    with _APP_CONTEXTS_LOCK:
+        if key not in _APP_CONTEXTS:
+            _APP_CONTEXTS[key] = _new_app_context(proxy_config)
+        return _APP_CONTEXTS[key]
+
+
 @asynccontextmanager
 async def _app_lifespan(_server: FastMCP, proxy_config: ProxyConfig | None) -> AsyncIterator[AppContext]:
-    with requests.Session() as http_client, YoutubeDL(params={"quiet": True}, auto_init=False) as dlp:
-        http_client.verify = False
-        ytt_api = YouTubeTranscriptApi(http_client=http_client, proxy_config=proxy_config)
-        dlp.add_info_extractor(YoutubeIE())
-        yield AppContext(http_client=http_client, ytt_api=ytt_api, dlp=dlp)
+    yield await asyncio.to_thread(_get_app_context, proxy_config)
 
 
 class Transcript(BaseModel):
@@ -64,33 +182,94 @@ class VideoInfo(BaseModel):
     duration: str = Field(description="Duration of the video")
 
 
+@lru_cache(maxsize=4096)
+def _fmt_duration(seconds: int) -> str:
+    return humanize.naturaldelta(timedelta(seconds=seconds))
+
+
 def _parse_time_info(date: int, timestamp: int, duration: int) -> Tuple[datetime, str]:
-    parsed_date = datetime.strptime(str(date), "%Y%m%d").date()
-    parsed_time = datetime.strptime(str(timestamp), "%H%M%S%f").time()
-    upload_date = datetime.combine(parsed_date, parsed_time)
-    duration_str = humanize.naturaldelta(timedelta(seconds=duration))
+    d = int(date)
+    t = _TIME_RE.fullmatch(str(timestamp))
+    if t is None:
+        raise ValueError(f"time data {timestamp!r} does not match format '%H%M%S%f'")
+    upload_date = datetime(
+        d // 10000, d // 100 % 100, d % 100, int(t[1]), int(t[2]), int(t[3]), int(t[4].ljust(6, "0"))
+    )
+    duration_str = _fmt_duration(duration)
     return upload_date, duration_str
 
 
-@lru_cache
-def _get_transcript(ctx: AppContext, video_id: str, lang: str) -> Tuple[str, list[str]]:
-    if lang == "en":
-        languages = ["en"]
-    else:
-        languages = [lang, "en"]
+def _parse_video_id(url: str) -> str:
+    m = _VIDEO_ID_RE.match(url)
+    if m is None:
+        raise ValueError(f"couldn't find a video ID from the provided URL: {url}.")
+    return m.group(1) or m.group(2)
+
+
+def _cache_key(_ctx: AppContext, *args: Hashable) -> Tuple[Hashable, ...]:
+    # Results don't depend on the AppContext, so leave it out of the key.
+    return hashkey(*args)
+
 
+def _fetch_title(ctx: AppContext, video_id: str, languages: list[str]) -> str:
     page = ctx.http_client.get(
         f"https://www.youtube.com/watch?v={video_id}", headers={"Accept-Language": ",".join(languages)}
     )
     page.raise_for_status()
-    soup = BeautifulSoup(page.text, "html.parser")
-    title = soup.title.string if soup.title and soup.title.string else "Transcript"
+    m = _TITLE_RE.search(page.content)
+    if m is None or not m.group(1):
+        return "Transcript"
+    return html.unescape(m.group(1).decode(page.encoding or "utf-8", errors="replace"))
+
+
+def _languages(lang: str) -> list[str]:
+    if lang == "en":
+        return ["en"]
+    return [lang, "en"]
+
+
+@cached(TTLCache(maxsize=64, ttl=3600), key=_cache_key, lock=threading.Lock())
+def _get_title(ctx: AppContext, video_id: str, lang: str) -> str:
+    return _fetch_title(ctx, video_id, _languages(lang))
+
+
+@cached(TTLCache(maxsize=64, ttl=3600), key=_cache_key, lock=threading.Lock())
+def _get_transcript_text(ctx: AppContext, video_id: str, lang: str) -> str:
+    transcripts = ctx.ytt_api.fetch(video_id, languages=_languages(lang))
+    return "\n".join(map(attrgetter("text"), transcripts.snippets))
+
+
+@cached(TTLCache(maxsize=64, ttl=3600), key=_cache_key, lock=threading.Lock())
+def _get_transcript_lines(ctx: AppContext, video_id: str, lang: str) -> Tuple[list[str], list[int]]:
+    transcripts = ctx.ytt_api.fetch(video_id, languages=_languages(lang))
+    lines = list(map(attrgetter("text"), transcripts.snippets))
+    return lines, list(accumulate((len(line) + 1 for line in lines), initial=0))
 
-    transcripts = ctx.ytt_api.fetch(video_id, languages=languages)
-    return title, [item.text for item in transcripts]
 
+def _paginate(lines: list[str], cumlen: list[int], next_cursor: str | None, limit: int) -> Tuple[str, str | None]:
+    start = int(next_cursor or 0)
+    if start < 0:
+        raise ValueError(f"invalid cursor: {next_cursor}")
+    start = min(start, len(lines))
+    end = bisect.bisect_right(cumlen, cumlen[start] + limit) - 1
+    cursor = str(end) if end < len(lines) else None
+    return "\n".join(lines[start:end]), cursor
 
-@lru_cache
+
+_T = TypeVar("_T")
+
+
+async def _get_with_title(
+    get_transcript: Callable[[AppContext, str, str], _T], ctx: AppContext, video_id: str, lang: str
+) -> Tuple[str, _T]:
+    title, transcript = await asyncio.gather(
+        asyncio.to_thread(_get_title, ctx, video_id, lang),
+        asyncio.to_thread(get_transcript, ctx, video_id, lang),
+    )
+    return title, transcript
+
+
+@cached(TTLCache(maxsize=64, ttl=3600), key=_cache_key, lock=threading.Lock())
 def _get_video_info(ctx: AppContext, video_url: str) -> VideoInfo:
     res = ctx.dlp.extract_info(video_url, download=False)
     upload_date, duration = _parse_time_info(res["upload_date"], res["timestamp"], res["duration"])
@@ -120,45 +299,46 @@ def server(
 
     mcp = FastMCP("Youtube Transcript", lifespan=partial(_app_lifespan, proxy_config=proxy_config))
 
-    @mcp.tool()
-    async def get_transcript(
-        ctx: Context[ServerSession, AppContext],
-        url: str = Field(description="The URL of the YouTube video"),
-        lang: str = Field(description="The preferred language for the transcript", default="en"),
-        next_cursor: str | None = Field(description="Cursor to retrieve the next page of the transcript", default=None),
-    ) -> Transcript:
-        """Retrieves the transcript of a YouTube video."""
-        parsed_url = urlparse(url)
-        if parsed_url.hostname == "youtu.be":
-            video_id = parsed_url.path.lstrip("/")
-        else:
-            q = parse_qs(parsed_url.query).get("v")
-            if q is None:
-                raise ValueError(f"couldn't find a video ID from the provided URL: {url}.")
-            video_id = q[0]
-
-        title, transcripts = _get_transcript(ctx.request_context.lifespan_context, video_id, lang)
-
-        if response_limit is None or response_limit <= 0:
-            return Transcript(title=title, transcript="\n".join(transcripts))
-
-        res = ""
-        cursor = None
-        for i, line in islice(enumerate(transcripts), int(next_cursor or 0), None):
-            if len(res) + len(line) + 1 > response_limit:
-                cursor = str(i)
-                break
-            res += f"{line}\n"
-
-        return Transcript(title=title, transcript=res[:-1], next_cursor=cursor)
+    if response_limit is None or response_limit <= 0:
+
+        @mcp.tool()
+        async def get_transcript(
+            ctx: Context[ServerSession, AppContext],
+            url: str = Field(description="The URL of the YouTube video"),
+            lang: str = Field(description="The preferred language for the transcript", default="en"),
+        ) -> Transcript:
+            """Retrieves the transcript of a YouTube video."""
+            title, transcript = await _get_with_title(
+                _get_transcript_text, ctx.request_context.lifespan_context, _parse_video_id(url), lang
+            )
+            return Transcript(title=title, transcript=transcript)
+
+    else:
+        limit = response_limit
+
+        @mcp.tool()
+        async def get_transcript(
+            ctx: Context[ServerSession, AppContext],
+            url: str = Field(description="The URL of the YouTube video"),
+            lang: str = Field(description="The preferred language for the transcript", default="en"),
+            next_cursor: str | None = Field(
+                description="Cursor to retrieve the next page of the transcript", default=None
+            ),
+        ) -> Transcript:
+            """Retrieves the transcript of a YouTube video."""
+            title, (lines, cumlen) = await _get_with_title(
+                _get_transcript_lines, ctx.request_context.lifespan_context, _parse_video_id(url), lang
+            )
+            transcript, cursor = _paginate(lines, cumlen, next_cursor, limit)
+            return Transcript(title=title, transcript=transcript, next_cursor=cursor)
 
     @mcp.tool()
-    def get_video_info(
+    async def get_video_info(
         ctx: Context[ServerSession, AppContext],
         url: str = Field(description="The URL of the YouTube video"),
     ) -> VideoInfo:
         """Retrieves the video information."""
-        return _get_video_info(ctx.request_context.lifespan_context, url)
+        return await asyncio.to_thread(_get_video_info, ctx.request_context.lifespan_context, url)
 
     return mcp
 
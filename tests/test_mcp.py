@@ -6,26 +6,81 @@
 #
 #  http://opensource.org/licenses/mit-license.php
 from datetime import datetime, timedelta
+import html
 import os
-from typing import AsyncGenerator
+import re
+import threading
+from typing import Any, AsyncGenerator, Generator
+from unittest.mock import Mock
 
 import humanize
 import pytest
 import requests
-from bs4 import BeautifulSoup
 from mcp import StdioServerParameters, stdio_client, ClientSession
 from mcp.types import TextContent
+from pytest_mock import MockerFixture
 from youtube_transcript_api import YouTubeTranscriptApi
 import yt_dlp
 from yt_dlp.extractor.youtube import YoutubeIE
 
-from mcp_youtube_transcript import Transcript, VideoInfo, _parse_time_info
+from mcp_youtube_transcript import (
+    AppContext,
+    Transcript,
+    VideoInfo,
+    _fetch_title,
+    _get_title,
+    _get_transcript_lines,
+    _get_transcript_text,
+    _get_video_info,
+    _get_with_title,
+    _paginate,
+    _parse_time_info,
+    _parse_video_id,
+)
+
+
+_TITLE_RE = re.compile(r"<title>(.*?)</title>", re.I | re.S)
+
+_SESSION = requests.Session()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def http_session() -> Generator[requests.Session, None, None]:
+    with _SESSION:
+        yield _SESSION
 
 
 def fetch_title(url: str, lang: str) -> str:
-    res = requests.get(f"https://www.youtube.com/watch?v={url}", headers={"Accept-Language": lang})
-    soup = BeautifulSoup(res.text, "html.parser")
-    return soup.title.string or "" if soup.title else ""
+    res = _SESSION.get(f"https://www.youtube.com/watch?v={url}", headers={"Accept-Language": lang})
+    m = _TITLE_RE.search(res.text)
+    return html.unescape(m.group(1)) if m else ""
+
+
+@pytest.fixture(autouse=True)
+def clear_caches() -> Generator[None, None, None]:
+    caches = (_get_title, _get_transcript_text, _get_transcript_lines, _get_video_info)
+    for cache in caches:
+        cache.cache_clear()
+    yield
+    for cache in caches:
+        cache.cache_clear()
+
+
+@pytest.fixture
+def app_ctx() -> Mock:
+    return Mock(spec=AppContext, http_client=Mock(), ytt_api=Mock(), dlp=Mock())
+
+
+@pytest.fixture
+def video_info() -> dict[str, Any]:
+    return {
+        "title": "title",
+        "description": "description",
+        "uploader": "uploader",
+        "upload_date": 20250921,
+        "timestamp": 1650496000,
+        "duration": 1234567,
+    }
 
 
 @pytest.fixture(scope="module")
@@ -233,3 +288,85 @@ def test_parse_time_info() -> None:
     upload_date, duration = _parse_time_info(20250921, 1650496000, 1234567)
     assert upload_date == datetime(2025, 9, 21, 16, 50, 49, 600000)
     assert duration == humanize.naturaldelta(timedelta(seconds=1234567))
+
+
+def test_parse_time_info_matches_strptime() -> None:
+    cases = [(20250921, 1650496000), ("20251015", 1760000000), (19991231, 235959999999), (20000101, 1234567)]
+    for date, timestamp in cases:
+        upload_date, _ = _parse_time_info(date, timestamp, 0)  # type: ignore[arg-type]
+        assert upload_date == datetime.combine(
+            datetime.strptime(str(date), "%Y%m%d").date(), datetime.strptime(str(timestamp), "%H%M%S%f").time()
+        )
+
+
+def test_get_video_info_cache(app_ctx: Mock, video_info: dict[str, Any]) -> None:
+    url = "https://www.youtube.com/watch?v=LPZh9BOjkQs"
+    app_ctx.dlp.extract_info.return_value = video_info
+
+    first = _get_video_info(app_ctx, url)
+    second = _get_video_info(app_ctx, url)
+
+    assert first is second
+    app_ctx.dlp.extract_info.assert_called_once_with(url, download=False)
+
+
+def test_parse_video_id() -> None:
+    video_id = "LPZh9BOjkQs"
+    assert _parse_video_id(f"https://www.youtube.com/watch?v={video_id}") == video_id
+    assert _parse_video_id(f"https://m.youtube.com/watch?feature=share&v={video_id}&t=10s") == video_id
+    assert _parse_video_id(f"https://youtu.be/{video_id}?si=abc") == video_id
+    assert _parse_video_id(f"youtube.com/watch?v={video_id}") == video_id
+    assert _parse_video_id(f"https://music.youtube.com/watch?v={video_id}") == video_id
+    assert _parse_video_id(f"https://WWW.YOUTUBE.COM/watch?v={video_id}") == video_id
+
+    with pytest.raises(ValueError):
+        _parse_video_id("https://www.youtube.com/watch?vv=abcdefg")
+    with pytest.raises(ValueError):
+        _parse_video_id(f"https://www.youtube.com/watch?v={video_id}EXTRA")
+    with pytest.raises(ValueError):
+        _parse_video_id(f"https://youtu.be/{video_id}123")
+
+
+def test_fetch_title(mocker: MockerFixture, app_ctx: Mock) -> None:
+    app_ctx.http_client.get.return_value = mocker.Mock(
+        status_code=200, content=b"<html><head><title>A &amp; B \xff - YouTube</title>", encoding="utf-8"
+    )
+    assert _fetch_title(app_ctx, "LPZh9BOjkQs", ["en"]) == "A & B \ufffd - YouTube"
+    app_ctx.http_client.get.assert_called_once_with(
+        "https://www.youtube.com/watch?v=LPZh9BOjkQs", headers={"Accept-Language": "en"}
+    )
+
+    app_ctx.http_client.get.return_value = mocker.Mock(status_code=200, content=b"<html></html>", encoding="utf-8")
+    assert _fetch_title(app_ctx, "LPZh9BOjkQs", ["en"]) == "Transcript"
+
+
+@pytest.mark.anyio
+async def test_get_with_title_fetches_concurrently(mocker: MockerFixture, app_ctx: Mock) -> None:
+    title_requested = threading.Event()
+
+    def get(*_args: Any, **_kwargs: Any) -> Any:
+        title_requested.set()
+        return mocker.Mock(status_code=200, content=b"<title>title</title>", encoding="utf-8")
+
+    def fetch(*_args: Any, **_kwargs: Any) -> Any:
+        # The transcript is only returned if the title is requested while it is being downloaded.
+        assert title_requested.wait(timeout=5)
+        return mocker.Mock(snippets=[mocker.Mock(text="a"), mocker.Mock(text="b")])
+
+    app_ctx.http_client.get.side_effect = get
+    app_ctx.ytt_api.fetch.side_effect = fetch
+
+    assert await _get_with_title(_get_transcript_text, app_ctx, "LPZh9BOjkQs", "en") == ("title", "a\nb")
+
+
+def test_paginate(app_ctx: Mock) -> None:
+    app_ctx.ytt_api.fetch.return_value = Mock(snippets=[Mock(text="abc"), Mock(text="de"), Mock(text="f")])
+    lines, cumlen = _get_transcript_lines(app_ctx, "LPZh9BOjkQs", "en")
+
+    assert _paginate(lines, cumlen, None, 7) == ("abc\nde", "2")
+    assert _paginate(lines, cumlen, "2", 7) == ("f", None)
+    assert _paginate(lines, cumlen, None, 3) == ("", "0")
+    assert _paginate(lines, cumlen, "3", 7) == ("", None)
+    assert _paginate(lines, cumlen, "10", 7) == ("", None)
+    with pytest.raises(ValueError):
+        _paginate(lines, cumlen, "-1", 7)
@@ -7,10 +7,28 @@
 #  http://opensource.org/licenses/mit-license.php
 from typing import Any, TypeGuard
 
+import anyio
 import pytest
+from pytest_mock import MockerFixture
+from requests.adapters import HTTPAdapter
 from youtube_transcript_api.proxies import WebshareProxyConfig, GenericProxyConfig
 
-from mcp_youtube_transcript import server, AppContext
+from mcp_youtube_transcript import server, AppContext, _warm_up
+
+
+@pytest.fixture(autouse=True)
+def no_warm_up(mocker: MockerFixture) -> None:
+    mocker.patch("mcp_youtube_transcript._warm_up")
+
+
+def test_warm_up_does_not_retry(mocker: MockerFixture) -> None:
+    adapter = HTTPAdapter()
+    conn = mocker.Mock()
+    mocker.patch.object(adapter, "get_connection_with_tls_context", return_value=conn)
+
+    _warm_up(AppContext(proxy_config=None, adapter=adapter))
+
+    conn.urlopen.assert_called_once_with("HEAD", "/", retries=False, timeout=5)
 
 
 def is_webshare_proxy_config(obj: Any) -> TypeGuard[WebshareProxyConfig]:
@@ -31,6 +49,15 @@ async def test_new_server() -> None:
         assert not app_ctx.http_client.proxies
         assert not app_ctx.ytt_api._fetcher._proxy_config
 
+        adapter = app_ctx.http_client.get_adapter("https://www.youtube.com/")
+        assert isinstance(adapter, HTTPAdapter)
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == 32
+        assert adapter.max_retries.total == 2
+
+        other = await anyio.to_thread.run_sync(lambda: app_ctx.http_client)
+        assert other is not app_ctx.http_client
+        assert other.get_adapter("https://www.youtube.com/") is adapter
+
 
 @pytest.mark.anyio
 async def test_new_server_with_webshare_proxy() -> None:
@@ -136,3 +163,36 @@ async def test_new_server_with_https_proxy() -> None:
         assert is_generic_proxy_config(app_ctx.ytt_api._fetcher._proxy_config)
         assert app_ctx.ytt_api._fetcher._proxy_config.http_url is None
         assert app_ctx.ytt_api._fetcher._proxy_config.https_url == https_proxy
+
+
+@pytest.mark.anyio
+async def test_app_context_is_shared_across_lifespans() -> None:
+    mcp = server()
+
+    async with mcp.settings.lifespan(mcp) as first:  # type: ignore
+        pass
+    async with mcp.settings.lifespan(mcp) as second:  # type: ignore
+        pass
+    async with server(http_proxy="http://localhost:8080").settings.lifespan(mcp) as proxied:  # type: ignore
+        pass
+    async with server(http_proxy="http://localhost:8080").settings.lifespan(mcp) as same_proxy:  # type: ignore
+        pass
+    async with server(http_proxy="http://localhost:8081").settings.lifespan(mcp) as other_proxy:  # type: ignore
+        pass
+
+    assert first is second
+    assert proxied is not first
+    assert same_proxy is proxied
+    assert other_proxy is not proxied
+
+
+@pytest.mark.anyio
+async def test_get_transcript_tool_without_response_limit() -> None:
+    tools = {tool.name: tool for tool in await server().list_tools()}
+    assert "next_cursor" not in tools["get_transcript"].inputSchema["properties"]
+
+
+@pytest.mark.anyio
+async def test_get_transcript_tool_with_response_limit() -> None:
+    tools = {tool.name: tool for tool in await server(response_limit=3000).list_tools()}
+    assert "next_cursor" in tools["get_transcript"].inputSchema["properties"]